@@ -0,0 +1,2 @@
+from .watcher import FileWatcher
+from .handler import MsgHandler
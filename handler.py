@@ -1,5 +1,13 @@
+import re
+
 class MsgHandler(object):
     def __init__(self, msg_pattern, funcs):
         self.msg_pattern = msg_pattern # message pattern
         self.funcs = funcs # a list of functions to handle the message
-        
\ No newline at end of file
+        self.regex = re.compile(msg_pattern) # compiled once, not per message
+
+    def match(self, msg):
+        """
+        check whether a message matches the pattern
+        """
+        return self.regex.match(msg) is not None
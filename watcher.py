@@ -1,48 +1,215 @@
+import array
 import asyncio
+import collections
+import ctypes
+import ctypes.util
+import fnmatch
 import logging
 import os
+import re
+import stat
+import struct
 from typing import List, Set, Union
 
 from glob import glob
-from queue import Queue
 from typing import Optional
 
+try:
+    from re import _parser as sre_parse # Python 3.11+
+except ImportError:
+    import sre_parse
+
+try:
+    # optional, batches reads across many files into one syscall
+    import liburing
+except ImportError:
+    liburing = None
+
+try:
+    # optional, SIMD newline scan on large buffers
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    # optional, matches all handler patterns in one DFA walk
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
 FILE_PICK_TYPE = 1
 DIR_PICK_TYPE = 2
 
+PREFIX_LEN = 1 # length of the literal prefix handlers are bucketed by
+SIMD_SPLIT_THRESHOLD = 4096 # buffer size above which numpy splitting pays off
+DROP_CACHE_BYTES = 1 << 20 # consumed bytes between page-cache drop hints
+
+# inotify(7) flags, see <sys/inotify.h>
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+IN_MODIFY = 0x00000002
+IN_CREATE = 0x00000100
+IN_MOVE_SELF = 0x00000800
+
+class Inotify(object):
+    """
+    thin wrapper around Linux inotify(7) via libc,
+    exposes the event fd so it can be plugged into the event loop
+    """
+    _EVENT_FMT = "iIII"  # wd, mask, cookie, len
+    _EVENT_SIZE = struct.calcsize(_EVENT_FMT)
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return wd
+
+    def read_events(self):
+        """
+        drain all queued events without blocking,
+        returns a list of (wd, mask, name) tuples
+        """
+        events = []
+        while True:
+            try:
+                data = os.read(self._fd, 4096)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                logging.warning(f"Read inotify fd error: msg={str(e)}")
+                break
+            pos = 0
+            while pos + self._EVENT_SIZE <= len(data):
+                wd, mask, cookie, length = struct.unpack_from(self._EVENT_FMT, data, pos)
+                pos += self._EVENT_SIZE
+                # fsdecode mirrors the fsencode on add_watch, so one
+                # odd filename cannot throw away a whole event batch
+                name = os.fsdecode(data[pos:pos+length].rstrip(b"\x00"))
+                pos += length
+                events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self._fd)
+
+def _read_into(fd: int, buf: bytearray) -> int:
+    """
+    read all currently-available bytes of fd into buf, returns the
+    byte count read; kept as a flat function over locals and builtin
+    types so the hot loop can be AOT-compiled (mypyc/Cython) without
+    touching the class
+    """
+    total = 0
+    read = os.read
+    while True:
+        try:
+            chunk = read(fd, 65536)
+        except BlockingIOError:
+            break
+        n = len(chunk)
+        if n == 0:
+            break
+        buf.extend(chunk)
+        total += n
+    return total
+
 class FileWatcher(object):
     def __init__(
-        self, 
-        path: Union[str, List[str]]=None, 
-        every: bool=False, 
-        exclude: Union[str, List[str]]=None, 
+        self,
+        path: Union[str, List[str]]=None,
+        every: bool=False,
+        exclude: Union[str, List[str]]=None,
         interval: int=60,
         qmaxsize: int=1000) -> None:
         """
         Initialize file watcher
-        """ 
+        """
         self.files_included = self.parse_path(path) # file paths to watch
         self.files_excluded = self.parse_path(exclude)
-        # self.dirs = self.parse_path(path, DIR_PICK_TYPE) if every else [] # dir paths to watch for new files
+        # raw exclude patterns, files that appear later must still match them
+        self._exclude_patterns = [os.path.abspath(p) for p in
+                                  ([exclude] if isinstance(exclude, str) else (exclude or []))]
+        self.dirs = set() # dir paths to watch for new files
+        self._dir_patterns = {} # dir path -> basename patterns new files must match
+        if every:
+            for pat in ([path] if isinstance(path, str) else (path or [])):
+                dirs = self._parse_path(pat, DIR_PICK_TYPE)
+                for d in dirs:
+                    # the pattern names the dir itself, take any new file
+                    self._dir_patterns.setdefault(d, set()).add("*")
+                if not dirs:
+                    # a file pattern like /var/log/*.log names no dir,
+                    # watch its parent dir for files matching the basename
+                    for d in self._parse_path(os.path.dirname(pat), DIR_PICK_TYPE):
+                        self._dir_patterns.setdefault(d, set()).add(os.path.basename(pat))
+            self.dirs = set(self._dir_patterns)
         self.handlers = [] # a list of handlers
+        self._by_prefix = {} # literal pattern prefix -> handlers
+        self._no_prefix = [] # handlers whose pattern has no literal prefix
+        self._hs_db = None # hyperscan database over all handler patterns
+
+        # per-file state as parallel arrays indexed by path_id:
+        # one int index instead of three str hash lookups per line
+        self._path_ids = {} # path -> path_id
+        self._paths_by_id = [] # path_id -> path
+        self._fds = [] # path_id -> raw fd, None when closed
+        self._bufs = [] # path_id -> pending partial-line bytes
+        self._progress = array.array("q") # path_id -> committed byte offset
+        self._dropped = array.array("q") # path_id -> offset already evicted from page cache
+
+        # event-driven watching via inotify, fall back to polling
+        # when it's unavailable (non-Linux, CIFS/SMB mounts, ...)
+        try:
+            self._inotify = Inotify()
+        except (OSError, AttributeError) as e:
+            self._inotify = None
+            logging.warning(f"Inotify unavailable, falling back to polling: msg={str(e)}")
+        self._watches = {} # wd -> path
+        self._readers = [] # fds registered with loop.add_reader
+
+        # io_uring lets one io_uring_enter reap reads for many files
+        self._ring = None
+        if liburing is not None:
+            try:
+                self._ring = liburing.io_uring()
+                liburing.io_uring_queue_init(64, self._ring)
+            except Exception as e:
+                self._ring = None
+                logging.warning(f"io_uring unavailable: msg={str(e)}")
+        self._dir_mtime = {} # dir path -> last seen mtime (ns)
+        self._dir_files = {} # dir path -> known file paths
 
-        self.fds = {} # file descriptors
-        self.progress = {} # progress of each file
         self._prepare()
-        
-        self.queue = Queue(qmaxsize)
+
+        # bounded ring buffer: append is O(1), atomic under the GIL,
+        # and evicts the oldest message itself when full
+        self.queue = collections.deque(maxlen=qmaxsize)
+        self._notify = asyncio.Event() # set when the ring has messages
         self.interval = interval
-        self.stop_watch_flag = False
+        self._stop = asyncio.Event()
 
     def parse_path(self, path: Union[str, List[str]], pick_type: int=FILE_PICK_TYPE) -> Set[str]:
         if isinstance(path, str):
             return self._parse_path(path, pick_type)
-        elif isinstance(path, list):
-            _path = set()
+        _path = set()
+        if isinstance(path, list):
             for p in path:
                 _path.update(self._parse_path(p, pick_type))
-            return _path
-    
+        return _path
+
     def _parse_path(self, path: str, pick_type: int=FILE_PICK_TYPE) -> Set[str]:
         """
         parse unix-style path to a list of paths,
@@ -54,18 +221,43 @@ class FileWatcher(object):
             return _path
 
         try:
-            for p in glob(path):
-                abspath = os.path.abspath(p)
-                if pick_type==FILE_PICK_TYPE and os.path.isfile(abspath):
+            dirname, basename = os.path.split(path)
+            if not any(c in basename for c in "*?["):
+                # no wildcard: a single stat is enough; files include
+                # non-regular ones (FIFOs, devices) that can be tailed
+                abspath = os.path.abspath(path)
+                if pick_type==FILE_PICK_TYPE and os.path.exists(abspath) \
+                        and not os.path.isdir(abspath):
                     _path.add(abspath)
                 elif pick_type==DIR_PICK_TYPE and os.path.isdir(abspath):
                     _path.add(abspath)
+            elif any(c in dirname for c in "*?["):
+                # wildcard in the dir part, let glob expand it
+                for p in glob(path):
+                    abspath = os.path.abspath(p)
+                    if pick_type==FILE_PICK_TYPE and os.path.isfile(abspath):
+                        _path.add(abspath)
+                    elif pick_type==DIR_PICK_TYPE and os.path.isdir(abspath):
+                        _path.add(abspath)
+            else:
+                # scandir DirEntry caches the entry type, no extra
+                # stat per entry like glob+abspath+isfile
+                dirname = os.path.abspath(dirname or ".")
+                with os.scandir(dirname) as it:
+                    for entry in it:
+                        if entry.name.startswith(".") and not basename.startswith("."):
+                            continue
+                        if not fnmatch.fnmatch(entry.name, basename):
+                            continue
+                        if pick_type==FILE_PICK_TYPE and entry.is_file():
+                            _path.add(entry.path)
+                        elif pick_type==DIR_PICK_TYPE and entry.is_dir():
+                            _path.add(entry.path)
         except Exception as e:
-            _path = []
             logging.warning(f"Parse path error: {str(e)}")
 
         return _path
-    
+
     def add_path(self, path: Union[str, List[str]]) -> None:
         """
         add file path to watch
@@ -81,103 +273,360 @@ class FileWatcher(object):
         _path = self.parse_path(path)
         for p in _path:
             self.files_excluded.update(p)
-    
-    # def add_dir(self, path):
-    #     """
-    #     add dir path to watch
-    #     """
-    #     _path = self.parse_path(path, pick_type=DIR_PICK_TYPE)
-    #     for p in _path:
-    #         self.dirs.append(p)
 
     def open(self, path):
         """
-        open file descriptor and seek to the beginning of the file
+        open a raw non-blocking file descriptor at the beginning of the file,
+        returns the fd or None on error
         """
         try:
-            f = open(path, "r")
-            f.seek(0)
-            if not f.readable():
-                f.close()
-                logging.warning(f"File not readable: path={path}")
-                return None
+            fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
         except Exception as e:
-            f = None
             logging.warning(f"Open file error: path={path}, msg={str(e)}")
+            return None
+
+        try:
+            # logs are read strictly forward, let readahead know
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except (AttributeError, OSError):
+            pass # non-regular file or platform without fadvise
+
+        return fd
 
-        return f
-    
     def close(self, path):
         """
         close file descriptor
         """
-        if path in self.fds.keys():
-            self.fds[path].close()
-            self.fds[path] = None
+        pid = self._path_ids.get(path)
+        if pid is not None and self._fds[pid] is not None:
+            os.close(self._fds[pid])
+            self._fds[pid] = None
+
+    def _open_path(self, path):
+        """
+        intern a path and open its fd/buffer/progress slots,
+        returns the path_id
+        """
+        pid = self._path_id(path)
+        if self._fds[pid] is None:
+            self._fds[pid] = self.open(path)
+            self._bufs[pid] = bytearray()
+            self._progress[pid] = 0
+        return pid
 
     def _prepare(self):
-        self.fds = {p:self.open(p) for p in self.files_included if p not in self.files_excluded}
-        self.progress = {p:0 for p in self.files_included if p not in self.files_excluded}
+        for p in self.files_included:
+            if p not in self.files_excluded:
+                self._open_path(p)
+        if self._inotify is not None:
+            for p in self._path_ids:
+                self._add_watch(p, IN_MODIFY | IN_MOVE_SELF)
+            for d in self.dirs:
+                self._add_watch(d, IN_CREATE)
 
-    async def watch_file(self, path):
+    def _add_watch(self, path, mask):
         """
-        watch file and put new lines into queue
+        register an inotify watch
         """
-        while not self.stop_watch_flag:
-            try:
-                f = self.fds[path]
-                if f is not None:
-                    msg = f.readline()
-                    self.put(path, msg)   
+        try:
+            wd = self._inotify.add_watch(path, mask)
+            self._watches[wd] = path
+        except OSError as e:
+            logging.warning(f"Add watch error: path={path}, msg={str(e)}")
+
+    def _drain_inotify(self):
+        """
+        callback fired by the event loop when the inotify fd is readable,
+        drains all queued events and reads every new line of touched files
+        """
+        touched = set()
+        watches, path_ids = self._watches, self._path_ids # hoisted, hot loop
+        for wd, mask, name in self._inotify.read_events():
+            path = watches.get(wd)
+            if path is None:
+                continue
+            if mask & IN_CREATE:
+                # new file in a watched dir, start watching it
+                new_path = os.path.join(path, name)
+                if new_path not in path_ids and self._accept_new_file(path, name) \
+                        and os.path.isfile(new_path):
+                    new_pid = self._open_path(new_path)
+                    self._add_watch(new_path, IN_MODIFY | IN_MOVE_SELF)
+                    self._drain(new_pid) # bytes written before the watch landed
+            else:
+                pid = path_ids.get(path)
+                if pid is not None: # e.g. IN_IGNORED on a watched dir
+                    touched.add(pid)
+        if self._ring is not None and len(touched) > 1:
+            self._drain_uring(touched)
+        else:
+            for pid in touched:
+                self._drain(pid)
+
+    def _accept_new_file(self, dirpath, name):
+        """
+        should a file created in a watched dir be watched: it must
+        match one of the dir's basename patterns and not be excluded
+        """
+        if self._is_excluded(os.path.join(dirpath, name)):
+            return False
+        for pat in self._dir_patterns.get(dirpath, ()):
+            if fnmatch.fnmatch(name, pat):
+                return True
+        return False
+
+    def _is_excluded(self, path):
+        """
+        is a path excluded, either resolved at startup or matching a
+        raw exclude pattern
+        """
+        if path in self.files_excluded:
+            return True
+        for pat in self._exclude_patterns:
+            if fnmatch.fnmatch(path, pat):
+                return True
+        return False
+
+    def _drain(self, pid):
+        """
+        read all currently-available bytes of a file in large chunks
+        and queue every complete line, one syscall per 64KB instead of
+        one readline per wake
+        """
+        fd = self._fds[pid]
+        if fd is None:
+            return
+        try:
+            _read_into(fd, self._bufs[pid])
+        except OSError as e:
+            logging.warning(f"Read file error: path={self._paths_by_id[pid]}, msg={str(e)}")
+            return
+        self._flush_lines(pid)
+
+    def _flush_lines(self, pid):
+        """
+        split the pending buffer on newline once and queue every
+        complete line, the partial tail stays buffered
+        """
+        buf = self._bufs[pid]
+        if not buf:
+            return
+        put = self._put
+        # one immutable chunk per flush, lines are queued as offsets
+        # into it so no per-line copy happens on the producer side
+        data = bytes(buf)
+        if numpy is not None and len(data) >= SIMD_SPLIT_THRESHOLD:
+            # find all newline offsets in one vectorized C scan
+            ends = numpy.flatnonzero(numpy.frombuffer(data, dtype=numpy.uint8) == 10).tolist()
+        else:
+            ends = []
+            find = data.find
+            end = find(b"\n")
+            while end >= 0:
+                ends.append(end)
+                end = find(b"\n", end + 1)
+        if not ends:
+            return
+        start = 0
+        for end in ends:
+            if end > start:
+                put(pid, data, start, end)
+            start = end + 1
+        buf[:] = data[start:]
+
+    def _drain_uring(self, pids):
+        """
+        submit one read per touched file and reap all completions in a
+        single io_uring_enter, instead of one read syscall per file;
+        any failure falls back to the plain per-fd drain
+        """
+        try:
+            ring = self._ring
+            submitted = []
+            for pid in pids:
+                fd = self._fds[pid]
+                if fd is None:
+                    continue
+                sqe = liburing.io_uring_get_sqe(ring)
+                if sqe is None:
+                    self._drain(pid) # submission queue full, read directly
+                    continue
+                # io_uring pread wants an explicit non-negative offset
+                # and does not move the fd position, track both by hand
+                pos = os.lseek(fd, 0, os.SEEK_CUR)
+                chunk = bytearray(1 << 16)
+                liburing.io_uring_prep_readv(sqe, fd, liburing.iovec(chunk), offset=pos)
+                sqe.user_data = pid
+                submitted.append((pid, fd, chunk, pos))
+            if not submitted:
+                return
+            liburing.io_uring_submit(ring)
+            results = {}
+            cqe = liburing.io_uring_cqe()
+            for _ in submitted:
+                liburing.io_uring_wait_cqe(ring, cqe)
+                results[cqe.user_data] = cqe.res
+                liburing.io_uring_cqe_seen(ring, cqe)
+            for pid, fd, chunk, pos in submitted:
+                n = results.get(pid, 0)
+                if n > 0:
+                    os.lseek(fd, pos + n, os.SEEK_SET)
+                    self._bufs[pid].extend(chunk[:n])
+                if n == len(chunk):
+                    self._drain(pid) # more than one chunk pending, finish it
                 else:
-                    self.fds.pop(path)
-                    self.progress.pop(path)
-            except Exception as e:
-                logging.warning(f"Watch file error: path={path}, msg={str(e)}")
-            await asyncio.sleep(self.interval)
+                    self._flush_lines(pid)
+        except Exception as e:
+            logging.warning(f"io_uring drain error, falling back to read: msg={str(e)}")
+            for pid in pids:
+                self._drain(pid)
+
+    async def _tick(self):
+        """
+        single polling-fallback loop: one timer wakes and drains every
+        watched file in order, instead of one sleeping coroutine per
+        file churning the loop's timer heap
+        """
+        drain = self._drain # hoisted, hot loop
+        while not self._stop.is_set():
+            for pid, fd in enumerate(self._fds):
+                if fd is None or fd in self._readers:
+                    continue # closed, or already dispatched by epoll
+                try:
+                    drain(pid)
+                except Exception as e:
+                    logging.warning(f"Watch file error: path={self._paths_by_id[pid]}, msg={str(e)}")
+            await self._sleep()
 
     async def watch_dir(self, path):
         """
-        watch dir and create new coroutines to watch new files
+        watch dir and open new files to watch (polling fallback),
+        only re-scan when the dir mtime changes: one stat per tick
+        instead of one per file
         """
-        while not self.stop_watch_flag:
-            _path = self.parse_path(path)
-            for p in _path:
-                if p not in self.fds.keys():
-                    self.fds[p] = self.open(p)
-                    self.progress[p] = 0
-            await asyncio.sleep(self.interval)
-    
+        while not self._stop.is_set():
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError as e:
+                logging.warning(f"Watch dir error: path={path}, msg={str(e)}")
+                await self._sleep()
+                continue
+            if mtime != self._dir_mtime.get(path):
+                self._dir_mtime[path] = mtime
+                _path = set()
+                for pat in self._dir_patterns.get(path, ("*",)):
+                    _path.update(self.parse_path(os.path.join(path, pat)))
+                known = self._dir_files.setdefault(path, set())
+                for p in _path - known:
+                    if p not in self._path_ids and not self._is_excluded(p):
+                        self._open_path(p)
+                self._dir_files[path] = _path
+            await self._sleep()
+
+    async def _sleep(self):
+        """
+        sleep for one interval or until stop() is called,
+        whichever comes first
+        """
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=self.interval)
+        except asyncio.TimeoutError:
+            pass
+
     def stop(self):
         """
-        stop watching
+        stop watching, wakes every sleeping coroutine immediately
         """
-        self.stop_watch_flag = True
-        for p in self.fds.keys():
+        self._stop.set()
+        self.queue.append(None) # unblock the consumer
+        self._notify.set()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            for fd in self._readers:
+                loop.remove_reader(fd)
+        self._readers = []
+        if self._inotify is not None:
+            if loop is not None:
+                loop.remove_reader(self._inotify.fileno())
+            self._inotify.close()
+            self._inotify = None
+        if self._ring is not None:
+            liburing.io_uring_queue_exit(self._ring)
+            self._ring = None
+        for p in list(self._path_ids):
             self.close(p)
 
-    def commit(self, path, offset):
+    def commit(self, pid, offset):
+        """
+        commit progress; consumed pages are never read again, so every
+        DROP_CACHE_BYTES tell the kernel to evict them and keep the
+        watcher's page-cache footprint bounded
+        """
+        self._progress[pid] += offset
+        if self._progress[pid] - self._dropped[pid] >= DROP_CACHE_BYTES:
+            end = self._progress[pid] & ~4095 # page-aligned
+            fd = self._fds[pid]
+            if fd is not None:
+                try:
+                    os.posix_fadvise(fd, self._dropped[pid],
+                                     end - self._dropped[pid],
+                                     os.POSIX_FADV_DONTNEED)
+                except (AttributeError, OSError):
+                    pass
+            self._dropped[pid] = end
+
+    def _path_id(self, path):
         """
-        commit progress
+        intern a path to a small int, a (path_id, msg) tuple on the
+        queue is ~4x smaller than a per-message dict
         """
-        self.progress[path] += offset
+        pid = self._path_ids.get(path)
+        if pid is None:
+            pid = len(self._paths_by_id)
+            self._path_ids[path] = pid
+            self._paths_by_id.append(path)
+            self._fds.append(None)
+            self._bufs.append(bytearray())
+            self._progress.append(0)
+            self._dropped.append(0)
+        return pid
 
     def put(self, path, msg):
         """
         put new message into queue
         """
         if msg:
-            self.queue.put({"path": path, "msg": msg})
+            if isinstance(msg, str):
+                msg = msg.encode()
+            self._put(self._path_id(path), msg, 0, len(msg))
+
+    def _put(self, pid, data, start, end):
+        """
+        put a framed message into queue as offsets into a shared
+        immutable chunk (no per-line copy); the bounded deque
+        tail-drops the oldest message itself when full
+        """
+        self.queue.append((pid, data, start, end))
+        self._notify.set()
 
-    def get(self):
+    async def get(self):
         """
         get message from queue
         """
-        _json = self.queue.get()
-        path = _json["path"]
-        msg = _json["msg"]
-        self.commit(path, len(msg))
-        return msg.strip()
+        queue = self.queue
+        while not queue:
+            self._notify.clear()
+            await self._notify.wait()
+        item = queue.popleft()
+        if item is None: # stop sentinel
+            return None
+        pid, data, start, end = item
+        self.commit(pid, end - start + 1) # +1 for the stripped newline
+        # decode straight off the view, the only copy is the str itself
+        return str(memoryview(data)[start:end], "utf-8", "replace").strip()
 
     def seek(self, path, offset, whence=0):
         """
@@ -185,36 +634,136 @@ class FileWatcher(object):
         """
         _path = self.parse_path(path)
         for p in _path:
-            if p in self.fds.keys():
+            pid = self._path_ids.get(p)
+            if pid is not None and self._fds[pid] is not None:
                 try:
-                    self.fds[p].seek(offset, whence)
+                    os.lseek(self._fds[pid], offset, whence)
+                    self._bufs[pid].clear()
                 except Exception as e:
                     logging.error(f"Seek file error: path={path}, offset={offset}, \
                                     whence={whence}, msg={str(e)}")
-    
+
     def register_handler(self, handler):
         """
-        register a handler to handle messages
+        register a handler to handle messages,
+        handlers whose pattern starts with a literal are bucketed by
+        that prefix so handle_msg only checks a small subset per message
         """
+        idx = len(self.handlers) # registration index, keeps dispatch order
         self.handlers.append(handler)
+        prefix = self._literal_prefix(getattr(handler, "msg_pattern", ""))
+        if len(prefix) >= PREFIX_LEN:
+            self._by_prefix.setdefault(prefix[:PREFIX_LEN], []).append((idx, handler))
+        else:
+            self._no_prefix.append((idx, handler))
+        self._rebuild_hs_db()
+
+    def _rebuild_hs_db(self):
+        """
+        compile every handler pattern into one hyperscan database so a
+        message is scanned once instead of once per handler
+        """
+        if hyperscan is None:
+            return
+        try:
+            expressions = []
+            for h in self.handlers:
+                # group before anchoring so every alternative is
+                # anchored, keeping re.match semantics
+                expressions.append(("^(?:" + h.msg_pattern + ")").encode())
+            db = hyperscan.Database()
+            db.compile(expressions=expressions, ids=list(range(len(expressions))))
+            self._hs_db = db
+        except Exception as e:
+            self._hs_db = None
+            logging.warning(f"Hyperscan compile error, falling back to re: msg={str(e)}")
+
+    @staticmethod
+    def _literal_prefix(pattern):
+        """
+        leading chars every match of the pattern must start with,
+        empty when the first char is not mandatory (quantified,
+        alternated, a class, ...)
+        """
+        try:
+            parsed = sre_parse.parse(pattern)
+        except Exception:
+            return ""
+        if parsed.state.flags & re.IGNORECASE:
+            return "" # a cased literal is not mandatory under (?i)
+        prefix = []
+        for op, arg in parsed:
+            if op is sre_parse.AT:
+                continue # ^ anchor, consumes no char
+            if op is not sre_parse.LITERAL:
+                break # quantifier, branch, class... not provably required
+            prefix.append(chr(arg))
+            if len(prefix) >= PREFIX_LEN:
+                break
+        return "".join(prefix)
 
     async def handle_msg(self, msg):
         """
         handle message
         """
-        for handler in self.handlers:
+        if self._hs_db is not None:
+            matched = set() # hyperscan may report the same id per end offset
+            self._hs_db.scan(
+                msg.encode(),
+                match_event_handler=lambda id_, start, end, flags, ctx: matched.add(id_))
+            for id_ in sorted(matched): # registration order
+                for func in self.handlers[id_].funcs:
+                    await func(msg)
+            return
+        bucket = self._by_prefix.get(msg[:PREFIX_LEN], ())
+        if self._no_prefix:
+            # merge so dispatch keeps registration order across buckets
+            candidates = sorted([*bucket, *self._no_prefix])
+        else:
+            candidates = bucket
+        for _, handler in candidates:
             if handler.match(msg):
                 for func in handler.funcs:
                     await func(msg)
-    
+
+    async def consume(self):
+        """
+        consume messages from queue and dispatch them to handlers
+        """
+        while not self._stop.is_set():
+            msg = await self.get()
+            if msg is None:
+                break
+            await self.handle_msg(msg)
+
     async def run(self):
         """
         run file watcher
         """
         self._prepare()
-        tasks = [asyncio.create_task(self.watch_file(p)) for p in self.paths]
-        tasks += [asyncio.create_task(self.watch_dir(p)) for p in self.dirs]
-        tasks += [asyncio.create_task(self.handle_msg(self.get()))]
+        loop = asyncio.get_running_loop()
+        tasks = []
+        for pid, fd in enumerate(self._fds):
+            if fd is None:
+                continue
+            mode = os.fstat(fd).st_mode
+            if stat.S_ISFIFO(mode) or stat.S_ISCHR(mode) or stat.S_ISSOCK(mode):
+                # pipes/sockets are pollable, let the loop's epoll
+                # dispatch them directly, no timer involved
+                loop.add_reader(fd, self._drain, pid)
+                self._readers.append(fd)
+        if self._inotify is not None:
+            # block in the event loop until the kernel reports changes,
+            # no wakeups on idle files
+            loop.add_reader(self._inotify.fileno(), self._drain_inotify)
+        else:
+            tasks += [asyncio.create_task(self._tick())]
+            tasks += [asyncio.create_task(self.watch_dir(p)) for p in self.dirs]
+        # deliver content that was already there before the watches landed
+        for pid, fd in enumerate(self._fds):
+            if fd is not None:
+                self._drain(pid)
+        tasks += [asyncio.create_task(self.consume())]
         await asyncio.gather(*tasks)
 
 if __name__ == "__main__":